@@ -7,7 +7,7 @@ from pydantic import BaseModel, Field, model_validator
 from app.llm import LLM
 from app.logger import logger
 from app.sandbox.client import SANDBOX_CLIENT
-from app.schema import ROLE_TYPE, AgentState, Memory, Message
+from app.schema import ROLE_TYPE, AgentEvents, AgentState, Memory, Message
 
 
 class BaseAgent(BaseModel, ABC):
@@ -35,6 +35,9 @@ class BaseAgent(BaseModel, ABC):
     state: AgentState = Field(
         default=AgentState.IDLE, description="Current agent state"
     )
+    events: AgentEvents = Field(
+        default_factory=AgentEvents, description="Callbacks for agent activity"
+    )
 
     # Execution control
     max_steps: int = Field(default=10, description="Maximum steps before termination")
@@ -55,6 +58,21 @@ class BaseAgent(BaseModel, ABC):
             self.memory = Memory()
         return self
 
+    async def emit(self, event: str, *args) -> None:
+        """Invoke the named AgentEvents callback, if one is registered.
+
+        Args:
+            event: Callback name on AgentEvents (e.g. "on_screenshot").
+            *args: Arguments passed to the callback.
+        """
+        callback = getattr(self.events, event)
+        if callback is None:
+            return
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error(f"Error in {event} callback: {e}")
+
     @asynccontextmanager
     async def state_context(self, new_state: AgentState):
         """Context manager for safe agent state transitions.
@@ -8,6 +8,7 @@ from app.logger import logger
 from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import Message, ToolChoice
 from app.tool import BrowserUseTool, Terminate, ToolCollection
+from app.tool.terminate import TERMINATE_NAME
 
 
 class BrowserAgent(ToolCallAgent):
@@ -34,7 +35,7 @@ class BrowserAgent(ToolCallAgent):
 
     # Use Auto for tool choice to allow both tool usage and free-form responses
     tool_choices: ToolChoice = ToolChoice.AUTO
-    special_tool_names: list[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: list[str] = Field(default_factory=lambda: [TERMINATE_NAME])
 
     _current_base64_image: Optional[str] = None
 
@@ -60,8 +61,9 @@ class BrowserAgent(ToolCallAgent):
                 return None
 
             # Store screenshot if available
-            if hasattr(result, "base64_image") and result.base64_image:
+            if result.base64_image:
                 self._current_base64_image = result.base64_image
+                await self.emit("on_screenshot", result.base64_image)
 
             # Parse the state info
             return json.loads(result.output)
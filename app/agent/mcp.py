@@ -8,6 +8,7 @@ from app.prompt.mcp import MULTIMEDIA_RESPONSE_PROMPT, NEXT_STEP_PROMPT, SYSTEM_
 from app.schema import AgentState, Message
 from app.tool.base import ToolResult
 from app.tool.mcp import MCPClients
+from app.tool.terminate import TERMINATE_NAME
 
 
 class MCPAgent(ToolCallAgent):
@@ -35,7 +36,7 @@ class MCPAgent(ToolCallAgent):
     _refresh_tools_interval: int = 5  # Refresh tools every N steps
 
     # Special tool names that should trigger termination
-    special_tool_names: List[str] = Field(default_factory=lambda: ["terminate"])
+    special_tool_names: List[str] = Field(default_factory=lambda: [TERMINATE_NAME])
 
     async def initialize(
         self,
@@ -167,7 +168,7 @@ class MCPAgent(ToolCallAgent):
     def _should_finish_execution(self, name: str, **kwargs) -> bool:
         """Determine if tool execution should finish the agent"""
         # Terminate if the tool name is 'terminate'
-        return name.lower() == "terminate"
+        return name.lower() == TERMINATE_NAME
 
     async def cleanup(self) -> None:
         """Clean up MCP connection when done."""
@@ -8,6 +8,7 @@ from app.logger import logger
 from app.prompt.planning import NEXT_STEP_PROMPT, PLANNING_SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, Message, ToolCall, ToolChoice
 from app.tool import PlanningTool, Terminate, ToolCollection
+from app.tool.terminate import TERMINATE_NAME
 
 
 class PlanningAgent(ToolCallAgent):
@@ -28,7 +29,7 @@ class PlanningAgent(ToolCallAgent):
         default_factory=lambda: ToolCollection(PlanningTool(), Terminate())
     )
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # type: ignore
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: List[str] = Field(default_factory=lambda: [TERMINATE_NAME])
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
     active_plan_id: Optional[str] = Field(default=None)
@@ -223,7 +224,7 @@ class PlanningAgent(ToolCallAgent):
         plan_created = False
         for tool_call in response.tool_calls:
             if tool_call.function.name == "planning":
-                result = await self.execute_tool(tool_call)
+                result, _, _ = await self.execute_tool(tool_call)
                 logger.info(
                     f"Executed tool {tool_call.function.name} with result: {result}"
                 )
@@ -32,6 +32,11 @@ class ReActAgent(BaseAgent, ABC):
 
     async def step(self) -> str:
         """Execute a single step: think and act."""
+        await self.emit(
+            "on_action",
+            "Agent Thinking",
+            "Analyzing current state and deciding next actions...",
+        )
         should_act = await self.think()
         if not should_act:
             return "Thinking complete - no action needed"
@@ -5,6 +5,7 @@ from pydantic import Field
 from app.agent.toolcall import ToolCallAgent
 from app.prompt.swe import NEXT_STEP_TEMPLATE, SYSTEM_PROMPT
 from app.tool import Bash, StrReplaceEditor, Terminate, ToolCollection
+from app.tool.terminate import TERMINATE_NAME
 
 
 class SWEAgent(ToolCallAgent):
@@ -19,7 +20,7 @@ class SWEAgent(ToolCallAgent):
     available_tools: ToolCollection = ToolCollection(
         Bash(), StrReplaceEditor(), Terminate()
     )
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: List[str] = Field(default_factory=lambda: [TERMINATE_NAME])
 
     max_steps: int = 30
 
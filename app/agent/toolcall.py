@@ -1,19 +1,73 @@
+import asyncio
+import hashlib
 import json
-from typing import Any, List, Optional, Union, Dict
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, ClassVar, List, Optional, Tuple, Union, Dict
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
 
 from app.llm import LLM
 from app.agent.base import BaseAgent
 from app.agent.react import ReActAgent
-from app.logger import logger
+from app.logger import logger, truncate
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
 from app.tool.base import ToolResult
+from app.tool.terminate import TERMINATE_NAME
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
 
+# Concurrent ask_tool calls per event loop unless AGENT_LLM_CONCURRENCY overrides it
+DEFAULT_LLM_CONCURRENCY = 8
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _llm_concurrency() -> int:
+    """Read AGENT_LLM_CONCURRENCY, falling back to the default if it is unset or invalid"""
+    raw = os.getenv("AGENT_LLM_CONCURRENCY")
+    if raw is None:
+        return DEFAULT_LLM_CONCURRENCY
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value < 1:
+        logger.warning(
+            f"Ignoring invalid AGENT_LLM_CONCURRENCY={raw!r}, using {DEFAULT_LLM_CONCURRENCY}"
+        )
+        return DEFAULT_LLM_CONCURRENCY
+    return value
+
+
+def _dumps_sorted(obj: Any) -> bytes:
+    """Serialize obj with sorted keys for stable hashing"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+    return json.dumps(obj, sort_keys=True, default=str).encode()
+
+
+# URL the browser landed on after a web_search action
+_NAV_URL_RE = re.compile(r"navigated to first result:\s*(\S+)")
+# Markers of a failed or empty browser extraction (including "Error: ..." tool failures)
+_EXTRACT_FAIL_RE = re.compile(r"not available|Error occurred|^Error", re.I)
+# Goal used for the last-resort extraction after repeated failures
+GENERIC_EXTRACTION_GOAL = "Extract all important information on this page"
+# Marker the model uses to signal it has gathered enough to answer
+FINAL_SUMMARY_MARKER = "Final Summary:"
+# Prefix browser_use puts on extract_content results
+EXTRACTION_MARKER = "Extracted from page:"
+
 class TerminateToolError(Exception):
     """Custom exception for errors specifically from the Terminate tool."""
     pass
@@ -31,34 +85,70 @@ class ToolCallAgent(ReActAgent):
         CreateChatCompletion(), Terminate()
     )
     tool_choices: TOOL_CHOICE_TYPE = ToolChoice.AUTO  # type: ignore
-    special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
+    special_tool_names: List[str] = Field(default_factory=lambda: [TERMINATE_NAME])
+    # Tools known to keep no shared state between calls; everything else (browser page,
+    # bash session, edited files, plans, MCP servers) runs serially
+    parallel_tool_names: List[str] = Field(
+        default_factory=lambda: ["web_search", "create_chat_completion"]
+    )
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
+    _special_tool_names_lc: frozenset = frozenset()  # Lowercased special_tool_names
+    _special_tool_names_src: Optional[List[str]] = None  # List the lookup was built from
+    _tools_params_cache: Optional[List[dict]] = None  # available_tools.to_params() output
+    _tools_params_src: Optional[tuple] = None  # available_tools.tools tuple the cache was built from
+    _cached_system_msgs: Optional[List[Message]] = None  # System messages built from system_prompt
+    _cached_system_prompt: Optional[str] = None  # Prompt the cached system messages were built from
+    _next_step_msg: Optional[Message] = None  # Validated user message for next_step_prompt
     _current_base64_image: Optional[str] = None
     _final_result: Optional[str] = None  # Store the final result before termination
-    extraction_attempts: Dict[str, int] = Field(default_factory=dict)  # Track extraction attempts per URL
+    extraction_attempts: Dict[str, int] = Field(default_factory=OrderedDict)  # Track extraction attempts per URL (LRU)
     last_extraction_url: Optional[str] = None  # Track the last URL we tried to extract from
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
     max_extraction_attempts: int = 3  # Maximum attempts to extract content from the same page
+    max_tracked_extractions: int = 256  # Extraction keys kept before the least recent is evicted
+    generic_extraction_timeout: float = 10.0  # Seconds allowed for the last-resort generic extraction
+    _pending_fallback: Optional[asyncio.Task] = None  # Background generic extraction awaiting the next think()
+    _fallback_due: bool = False  # Generic extraction to schedule once the current step's tools finish
+    tool_cache_ttl: float = 300.0  # Seconds an extract_content result stays reusable for the same page and goal
+    # "url|goal" -> (result, base64_image, timestamp) for successful extract_content calls
+    _tool_cache: Dict[str, Tuple[str, Optional[str], float]] = PrivateAttr(default_factory=dict)
+
+    # Deterministic (temperature 0) ask_tool responses are shared across agents
+    cache_enabled: bool = True
+    cache_max_entries: ClassVar[int] = 512
+    stats: ClassVar[Dict[str, int]] = {"hits": 0, "misses": 0}
+    _response_cache: ClassVar["OrderedDict[str, tuple]"] = OrderedDict()
+    # Bounds concurrent ask_tool calls across all agents on an event loop (e.g. UI sessions)
+    llm_concurrency: ClassVar[int] = _llm_concurrency()
+    # Event loop -> (LLM semaphore, cache key -> pending ask_tool request). Both are
+    # bound to the loop they were created on, so each loop gets its own.
+    _loop_state: ClassVar[
+        Dict[asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, Dict[str, "asyncio.Future"]]]
+    ] = {}
+
+    async def run(self, request: Optional[str] = None) -> str:
+        """Run the agent, discarding any generic extraction left over when it stops"""
+        try:
+            return await super().run(request)
+        finally:
+            self._cancel_pending_fallback()
 
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
+        await self._consume_pending_fallback()
+
         if self.next_step_prompt:
-            user_msg = Message.user_message(self.next_step_prompt)
-            self.messages += [user_msg]
+            self.messages += [self._get_next_step_msg()]
 
         try:
             # Get response with tool options
-            response = await self.llm.ask_tool(
+            response = await self._ask_tool_cached(
                 messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                tools=self.available_tools.to_params(),
+                system_msgs=self._get_system_msgs(),
+                tools=self._get_tool_params(),
                 tool_choice=self.tool_choices,
             )
         except ValueError:
@@ -84,16 +174,21 @@ class ToolCallAgent(ReActAgent):
         )
         content = response.content if response and response.content else ""
 
-        # Log response info
-        logger.info(f"✨ {self.name}'s thoughts: {content}")
-        logger.info(
-            f"🛠️ {self.name} selected {len(tool_calls) if tool_calls else 0} tools to use"
-        )
+        # Log response info; loguru only formats the arguments if the record is emitted
+        logger.info("✨ {}'s thoughts: {}", self.name, content)
         if tool_calls:
-            logger.info(
-                f"🧰 Tools being prepared: {[call.function.name for call in tool_calls]}"
+            logger.opt(lazy=True).info(
+                "🛠️ {} selected {} tools to use: {}",
+                lambda: self.name,
+                lambda: len(tool_calls),
+                lambda: [call.function.name for call in tool_calls],
             )
-            logger.info(f"🔧 Tool arguments: {tool_calls[0].function.arguments}")
+            logger.opt(lazy=True).info(
+                "🔧 Tool arguments: {}",
+                lambda: truncate(tool_calls[0].function.arguments),
+            )
+        else:
+            logger.info("🛠️ {} selected 0 tools to use", self.name)
 
         try:
             if response is None:
@@ -106,27 +201,35 @@ class ToolCallAgent(ReActAgent):
                         f"🤔 Hmm, {self.name} tried to use tools when they weren't available!"
                     )
                 if content:
-                    self.memory.add_message(Message.assistant_message(content))
+                    self.memory.add_message(
+                        Message.assistant_message(content, kind="thought")
+                    )
                     return True
                 return False
 
-            # Create and add assistant message
+            # Create and add assistant message; answers without tool calls and
+            # final summaries are tagged so the UI can surface them directly
+            is_final = bool(content) and FINAL_SUMMARY_MARKER in content
             assistant_msg = (
-                Message.from_tool_calls(content=content, tool_calls=self.tool_calls)
+                Message.from_tool_calls(
+                    content=content,
+                    tool_calls=self.tool_calls,
+                    kind="thought" if is_final else None,
+                )
                 if self.tool_calls
-                else Message.assistant_message(content)
+                else Message.assistant_message(content, kind="thought" if content else None)
             )
             self.memory.add_message(assistant_msg)
 
             # Check if we have gathered enough information and should terminate
-            if content and "Final Summary:" in content:
+            if is_final:
                 # Store the final result before terminating
                 self._final_result = content
                 # Call terminate tool
                 terminate_tool_call = ToolCall(
                     id="terminate",
                     type="function",
-                    function={"name": "terminate", "arguments": "{}"}
+                    function={"name": TERMINATE_NAME, "arguments": "{}"}
                 )
                 self.tool_calls = [terminate_tool_call]
                 return True
@@ -148,6 +251,121 @@ class ToolCallAgent(ReActAgent):
             )
             return False
 
+    def _get_tool_params(self) -> List[dict]:
+        """Return available_tools.to_params(), regenerated only when the tool set changes"""
+        # Every way of changing the tool set (add_tool, MCP reconnects, swapping
+        # the collection) assigns a new tools tuple, so identity is enough
+        tools = self.available_tools.tools
+        if self._tools_params_cache is None or self._tools_params_src is not tools:
+            self._tools_params_cache = self.available_tools.to_params()
+            self._tools_params_src = tools
+        return self._tools_params_cache
+
+    def _get_system_msgs(self) -> Optional[List[Message]]:
+        """Return the system messages for system_prompt, rebuilt only when the prompt changes"""
+        if self._cached_system_prompt != self.system_prompt:
+            self._cached_system_prompt = self.system_prompt
+            self._cached_system_msgs = (
+                [Message.system_message(self.system_prompt)]
+                if self.system_prompt
+                else None
+            )
+        return self._cached_system_msgs
+
+    def _get_next_step_msg(self) -> Message:
+        """Return a fresh user message for next_step_prompt without re-running validation"""
+        if self._next_step_msg is None or self._next_step_msg.content != self.next_step_prompt:
+            self._next_step_msg = Message.user_message(self.next_step_prompt)
+        # Messages are mutable once in memory, so every turn appends its own copy
+        return self._next_step_msg.model_copy()
+
+    def _response_cache_key(
+        self,
+        messages: List[Message],
+        system_msgs: Optional[List[Message]],
+        tools: List[dict],
+        tool_choice: TOOL_CHOICE_TYPE,  # type: ignore
+    ) -> str:
+        """Hash everything that determines an ask_tool response"""
+        payload = {
+            "messages": [m.model_dump() for m in messages],
+            "system": [m.model_dump() for m in system_msgs] if system_msgs else None,
+            "tools": tools,
+            "tool_choice": str(tool_choice),
+            "model": self.llm.model,
+        }
+        return hashlib.sha256(_dumps_sorted(payload)).hexdigest()
+
+    async def _ask_tool_cached(
+        self,
+        messages: List[Message],
+        system_msgs: Optional[List[Message]],
+        tools: List[dict],
+        tool_choice: TOOL_CHOICE_TYPE,  # type: ignore
+    ):
+        """Call llm.ask_tool, serving repeated deterministic requests from an LRU cache
+        and sharing a single request between identical calls already in flight"""
+        key = self._response_cache_key(messages, system_msgs, tools, tool_choice)
+        use_cache = self.cache_enabled and self.llm.temperature == 0
+
+        cache = ToolCallAgent._response_cache
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                self.stats["hits"] += 1
+                logger.info(f"♻️ Reusing cached LLM response (cache stats: {self.stats})")
+                response_type, response_data = cached
+                return response_type.model_validate(response_data)
+
+        inflight = self._get_loop_state()[1]
+        future = inflight.get(key)
+        if future is not None:
+            logger.info("♻️ Joining identical in-flight LLM request")
+            # Shield so one caller's cancellation doesn't cancel the shared request
+            return await asyncio.shield(future)
+
+        if use_cache:
+            self.stats["misses"] += 1
+        future = asyncio.ensure_future(
+            self._ask_tool_locked(
+                messages=messages,
+                system_msgs=system_msgs,
+                tools=tools,
+                tool_choice=tool_choice,
+            )
+        )
+        inflight[key] = future
+        try:
+            response = await asyncio.shield(future)
+        finally:
+            if inflight.get(key) is future:
+                del inflight[key]
+
+        if use_cache and response is not None:
+            cache[key] = (type(response), response.model_dump())
+            if len(cache) > self.cache_max_entries:
+                cache.popitem(last=False)
+        return response
+
+    async def _ask_tool_locked(self, **kwargs):
+        """Call llm.ask_tool while holding one of the event loop's LLM concurrency slots"""
+        async with self._get_loop_state()[0]:
+            return await self.llm.ask_tool(**kwargs)
+
+    @staticmethod
+    def _get_loop_state() -> Tuple[asyncio.Semaphore, Dict[str, "asyncio.Future"]]:
+        """Return the running loop's LLM semaphore and in-flight request map"""
+        loop = asyncio.get_running_loop()
+        states = ToolCallAgent._loop_state
+        state = states.get(loop)
+        if state is None:
+            # Forget loops that have been closed, e.g. by earlier asyncio.run() calls
+            for closed in [l for l in states if l.is_closed()]:
+                del states[closed]
+            state = states[loop] = (asyncio.Semaphore(ToolCallAgent.llm_concurrency), {})
+        return state
+
     async def act(self) -> str:
         """Execute tool calls and handle their results"""
         if not self.tool_calls:
@@ -158,69 +376,149 @@ class ToolCallAgent(ReActAgent):
             return self.messages[-1].content or "No content or commands to execute"
 
         results = []
-        for command in self.tool_calls:
-            # Check if the agent has been terminated by a previous tool call in this loop
-            if self.state == AgentState.FINISHED:
-                logger.info("Agent state is FINISHED, stopping further tool execution in this step.")
-                break
+        tool_msgs: List[Message] = []  # Flushed to memory once at the end of the step
+        try:
+            await self._run_tool_calls(results, tool_msgs)
+        finally:
+            self.memory.add_messages(tool_msgs)
 
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
+        # Start the fallback only after the step's last browser call, so it
+        # extracts the page the agent actually ended up on
+        if self._fallback_due and self.state != AgentState.FINISHED:
+            logger.info("Scheduling generic extraction after max attempts.")
+            self._pending_fallback = asyncio.create_task(self._attempt_generic_extraction())
+        self._fallback_due = False
 
-            result, terminated = await self.execute_tool(command)
+        return "\n\n".join(results)
 
-            if self.max_observe:
-                result = result[: self.max_observe]
+    async def _run_tool_calls(self, results: List[str], tool_msgs: List[Message]) -> None:
+        """Execute the current tool calls, collecting results and tool messages in order"""
+        # Independent tool calls at the head of the list run concurrently; the
+        # first special or stateful call (and everything after it) runs serially
+        # so termination, browser and shell state keep their ordering.
+        parallel_count = 0
+        for command in self.tool_calls:
+            if not self._is_parallel_safe(command.function.name):
+                break
+            parallel_count += 1
 
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+        if parallel_count > 1:
+            batch = self.tool_calls[:parallel_count]
+            outcomes = await asyncio.gather(
+                *(self.execute_tool(command) for command in batch),
+                return_exceptions=True,
             )
+            for command, outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    outcome = (
+                        f"Error: ⚠️ Tool '{command.function.name}' encountered a problem: {outcome}",
+                        False,
+                        None,
+                    )
+                result, _, base64_image = outcome
+                results.append(
+                    self._record_tool_result(command, result, base64_image, tool_msgs)
+                )
+        else:
+            parallel_count = 0
+
+        for command in self.tool_calls[parallel_count:]:
+            # Check if the agent has been terminated by a previous tool call in this loop
+            if self.state == AgentState.FINISHED:
+                logger.info("Agent state is FINISHED, stopping further tool execution in this step.")
+                break
 
-            # Add tool response to memory
-            tool_msg = Message.tool_message(
-                content=result,
-                tool_call_id=command.id,
-                name=command.function.name,
-                base64_image=self._current_base64_image,
+            result, terminated, base64_image = await self.execute_tool(command)
+            results.append(
+                self._record_tool_result(command, result, base64_image, tool_msgs)
             )
-            self.memory.add_message(tool_msg)
-            results.append(result)
 
             # Check if this tool call resulted in termination
             if terminated:
                 logger.info(f"Agent terminated by tool '{command.function.name}'. Stopping further actions in this step.")
                 break # Stop processing further tool calls in this step
 
-        return "\n\n".join(results)
+    def _record_tool_result(
+        self,
+        command: ToolCall,
+        result: str,
+        base64_image: Optional[str],
+        tool_msgs: List[Message],
+    ) -> str:
+        """Truncate and log a tool result and queue its tool message. Returns the stored result."""
+        # Keep the latest screenshot visible to subclasses and the UI
+        self._current_base64_image = base64_image
+
+        if self.max_observe:
+            result = result[: self.max_observe]
+
+        logger.info(
+            f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+        )
+
+        # Add tool response to memory
+        tool_msg = Message.tool_message(
+            content=result,
+            tool_call_id=command.id,
+            name=command.function.name,
+            base64_image=base64_image,
+            kind="extraction" if result.startswith(EXTRACTION_MARKER) else None,
+        )
+        tool_msgs.append(tool_msg)
+        return result
 
-    async def execute_tool(self, command: ToolCall) -> tuple[str, bool]:
-        """Execute a tool and handle the result. Returns (result_string, terminated_bool)."""
+    async def execute_tool(self, command: ToolCall) -> tuple[str, bool, Optional[str]]:
+        """Execute a tool and handle the result. Returns (result_string, terminated_bool, base64_image)."""
+        name = command.function.name
+        await self.emit("on_action", f"Tool: {name}", f"Arguments: {command.function.arguments}")
+
+        result, terminated, base64_image = await self._run_tool(command)
+
+        if base64_image:
+            await self.emit("on_screenshot", base64_image)
+        await self.emit("on_tool_result", name, result)
+        return result, terminated, base64_image
+
+    async def _run_tool(self, command: ToolCall) -> tuple[str, bool, Optional[str]]:
+        """Run a tool call and update tracking state. Returns (result_string, terminated_bool, base64_image)."""
         terminated = False # Initialize termination flag
+        base64_image = None # Screenshot captured by this call, kept local for concurrent calls
+        name = command.function.name
         try:
-            name = command.function.name
             args = command.function.arguments
             logger.info(f"🔧 Activating tool: '{name}'...")
 
             # Parse args as a dict
             if isinstance(args, str):
                 try:
-                    args = json.loads(args)
-                except (json.JSONDecodeError, Exception):
+                    args = _loads(args)
+                except (json.JSONDecodeError, Exception):  # orjson.JSONDecodeError subclasses json's
                     args = {}
 
-            # Extract tool result
-            tool_result = await self.available_tools.execute(name=name, tool_input=args)
-
-            # Handle tool exceptions and convert to string
-            if isinstance(tool_result, Exception):
-                result = str(tool_result)
-            elif isinstance(tool_result, ToolResult):
-                result = str(tool_result)
-                # Capture screenshot if available in ToolResult
-                if hasattr(tool_result, "base64_image") and tool_result.base64_image:
-                     self._current_base64_image = tool_result.base64_image
+            # Reuse a recent extraction of the same page and goal instead of re-running the browser
+            cache_key = self._extraction_cache_key(name, args)
+            cached = self._tool_cache.get(cache_key) if cache_key else None
+            if cached and time.monotonic() - cached[2] < self.tool_cache_ttl:
+                logger.info(f"♻️ Reusing cached extraction for {cache_key}")
+                result, base64_image = cached[0], cached[1]
             else:
-                result = str(tool_result) if tool_result is not None else ""
+                # Extract tool result
+                tool_result = await self.available_tools.execute(name=name, tool_input=args)
+
+                # Handle tool exceptions and convert to string
+                if isinstance(tool_result, ToolResult):
+                    result = str(tool_result)
+                    # Capture screenshot if available in ToolResult
+                    base64_image = tool_result.base64_image or None
+                elif tool_result is None:
+                    result = ""
+                elif isinstance(tool_result, str):
+                    result = tool_result
+                else:
+                    result = str(tool_result)
+
+                if cache_key and not _EXTRACT_FAIL_RE.search(result):
+                    self._tool_cache[cache_key] = (result, base64_image, time.monotonic())
 
             # Handle special tools (like terminate)
             # Note: _handle_special_tool sets self.state = AgentState.FINISHED
@@ -228,7 +526,7 @@ class ToolCallAgent(ReActAgent):
             if self.state == AgentState.FINISHED:
                 terminated = True
                 # If terminating, ensure the final_result reflects the termination message or prior useful data
-                if name.lower() == "terminate":
+                if name.lower() == TERMINATE_NAME:
                     # Use the result from the terminate tool itself
                      self._final_result = result
                 # else: Keep the existing _final_result (likely the data found before termination)
@@ -239,65 +537,156 @@ class ToolCallAgent(ReActAgent):
                 # The server-side formatting logic will handle this later
                 self._final_result = result
 
-                # Track extraction attempts for this URL if it's an extraction action
-                if args.get("action") == "extract_content" and isinstance(args.get("goal"), str):
-                    current_url = self.last_extraction_url
-                    extraction_goal = args.get("goal", "").lower()
-                    if current_url:
-                        extraction_key = f"{current_url}:{extraction_goal}"
-                        self.extraction_attempts[extraction_key] = self.extraction_attempts.get(extraction_key, 0) + 1
-                        if self.extraction_attempts[extraction_key] >= self.max_extraction_attempts:
-                            logger.warning(f"Reached maximum extraction attempts ({self.max_extraction_attempts}) for {extraction_key}")
-                            # If we still couldn't extract, try a generic extraction as a last resort
-                            if "not available" in result.lower() or "Error occurred during extraction" in result:
-                                logger.info("Final attempt with generic extraction after max attempts.")
-                                try:
-                                    generic_args = {"action": "extract_content", "goal": "Extract all important information on this page"}
-                                    follow_up_result_obj = await self.available_tools.execute(name="browser_use", tool_input=generic_args)
-                                    follow_up_result = str(follow_up_result_obj) # Convert to string
-                                    if follow_up_result and "not available" not in follow_up_result.lower() and "Error occurred" not in follow_up_result:
-                                        logger.info("Found better result with generic extraction")
-                                        self._final_result = follow_up_result
-                                        result = follow_up_result # Update the result for this step
-                                        # Capture screenshot if the fallback result has one
-                                        if isinstance(follow_up_result_obj, ToolResult) and follow_up_result_obj.base64_image:
-                                            self._current_base64_image = follow_up_result_obj.base64_image
-                                except Exception as e:
-                                    logger.error(f"Error in follow-up generic extraction: {e}")
-                            # Note: Automatic termination logic removed here, rely on agent's next thought or max_steps
-
-                # Update URL tracking for navigation actions
-                elif args.get("action") == "go_to_url" and isinstance(args.get("url"), str):
-                    self.last_extraction_url = args.get("url")
-                    self.extraction_attempts = {} # Reset attempts on navigation
-                elif args.get("action") == "web_search":
-                    # Extract the navigated URL from the web search result string
-                    search_result_lines = result.split('\\n')
-                    if search_result_lines and "navigated to first result:" in search_result_lines[0]:
-                         try:
-                            self.last_extraction_url = search_result_lines[0].split("navigated to first result: ")[1].strip()
-                         except IndexError:
-                             self.last_extraction_url = None # Failed to parse URL
-                    else:
-                         self.last_extraction_url = None # Navigated to search results page, not a specific link
-                    self.extraction_attempts = {} # Reset attempts on navigation
+                action = args.get("action")
+                # Any other browser action may have changed the page behind cached
+                # extractions and a pending generic extraction
+                if action != "extract_content":
+                    self._invalidate_tool_cache(self.last_extraction_url)
+                    self._cancel_pending_fallback()
+
+                handler = _BROWSER_ACTION_HANDLERS.get(action)
+                if handler:
+                    handler(self, args, result)
 
             # Log the result to agent memory (this now happens in act loop)
             # verbose_output = f"Observed output of cmd `{name}` executed:\\n{str(result)}"
             # self.memory.add_message(Message.system_message(verbose_output))
 
-            return result, terminated
+            return result, terminated, base64_image
 
+        except (asyncio.TimeoutError, ValueError) as e:
+            # Expected tool failures: log without building a traceback
+            error_msg = f"⚠️ Tool '{name}' encountered a problem: {e}"
+            logger.warning(error_msg)
+            return f"Error: {error_msg}", False, None # Return error message, not terminated, no image
         except Exception as e:
-            # Handle any uncaught exceptions during tool execution
-            try:
-                # Try to get tool name for context, might fail if error happened before 'name' assignment
-                error_context_name = name if 'name' in locals() else 'unknown tool'
-                error_msg = f"⚠️ Tool '{error_context_name}' encountered a problem: {str(e)}"
-            except Exception: # Fallback if even getting the name fails
-                error_msg = f"⚠️ Tool execution encountered a problem: {str(e)}"
+            # Handle any other uncaught exceptions during tool execution
+            error_msg = f"⚠️ Tool '{name}' encountered a problem: {e}"
             logger.exception(error_msg)
-            return f"Error: {error_msg}", False # Return error message and False for terminated flag
+            return f"Error: {error_msg}", False, None
+
+    def _handle_extract(self, args: dict, result: str) -> None:
+        """Track extraction attempts for the current URL and request the generic fallback"""
+        # The latest extraction decides whether the fallback is still needed
+        self._fallback_due = False
+        current_url = self.last_extraction_url
+        if not current_url or not isinstance(args.get("goal"), str):
+            return
+
+        extraction_key = f"{current_url}:{args['goal'].casefold()}"
+        if self._bump_extraction(extraction_key) < self.max_extraction_attempts:
+            return
+
+        logger.warning(f"Reached maximum extraction attempts ({self.max_extraction_attempts}) for {extraction_key}")
+        # If we still couldn't extract, try a generic extraction as a last resort.
+        # act() starts it in the background and the next think() picks it up.
+        if self._needs_generic_extraction(result) and self._pending_fallback is None:
+            self._fallback_due = True
+        # Note: Automatic termination logic removed here, rely on agent's next thought or max_steps
+
+    def _handle_goto(self, args: dict, result: str) -> None:
+        """Track the URL navigated to"""
+        if not isinstance(args.get("url"), str):
+            return
+        self.last_extraction_url = sys.intern(args["url"])
+        self.extraction_attempts.clear() # Reset attempts on navigation
+        self._invalidate_tool_cache(self.last_extraction_url)
+
+    def _handle_search(self, args: dict, result: str) -> None:
+        """Track the URL a web search landed on"""
+        # None means we stayed on the search results page
+        nav_match = _NAV_URL_RE.search(result)
+        self.last_extraction_url = sys.intern(nav_match.group(1)) if nav_match else None
+        self.extraction_attempts.clear() # Reset attempts on navigation
+        self._invalidate_tool_cache(self.last_extraction_url)
+
+    @staticmethod
+    def _needs_generic_extraction(result: str) -> bool:
+        """Check if an extraction failed; results without a failure marker are kept as is"""
+        return _EXTRACT_FAIL_RE.search(result) is not None
+
+    async def _attempt_generic_extraction(self) -> Optional[ToolResult]:
+        """Extract everything from the current page. Returns the result only if it found something."""
+        generic_args = {"action": "extract_content", "goal": GENERIC_EXTRACTION_GOAL}
+        try:
+            follow_up = await asyncio.wait_for(
+                self.available_tools.execute(name="browser_use", tool_input=generic_args),
+                timeout=self.generic_extraction_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Generic extraction timed out after {self.generic_extraction_timeout}s"
+            )
+            return None
+        except Exception as e:
+            logger.error(f"Error in follow-up generic extraction: {e}")
+            return None
+
+        if not isinstance(follow_up, ToolResult):
+            follow_up = ToolResult(output=str(follow_up))
+        follow_up_result = str(follow_up)
+        if not follow_up_result or _EXTRACT_FAIL_RE.search(follow_up_result):
+            return None
+        logger.info("Found better result with generic extraction")
+        return follow_up
+
+    async def _consume_pending_fallback(self) -> None:
+        """Add the result of a finished background generic extraction to memory"""
+        task, self._pending_fallback = self._pending_fallback, None
+        if task is None:
+            return
+        follow_up = await task
+        if follow_up is None:
+            return
+
+        result = str(follow_up)
+        self._final_result = result
+        if self.max_observe:
+            result = result[: self.max_observe]
+        self.memory.add_message(
+            Message.user_message(
+                f"Generic extraction of the current page:\n{result}",
+                base64_image=follow_up.base64_image or None,
+            )
+        )
+
+    def _cancel_pending_fallback(self) -> None:
+        """Drop a generic extraction that no longer matches the current page"""
+        self._fallback_due = False
+        task, self._pending_fallback = self._pending_fallback, None
+        if task is not None and not task.done():
+            task.cancel()
+
+    def _bump_extraction(self, key: str) -> int:
+        """Count an extraction attempt for key, evicting the least recent key past the cap"""
+        attempts = self.extraction_attempts
+        if not isinstance(attempts, OrderedDict):
+            attempts = self.extraction_attempts = OrderedDict(attempts)
+        count = attempts.get(key, 0) + 1
+        attempts[key] = count
+        attempts.move_to_end(key)
+        if len(attempts) > self.max_tracked_extractions:
+            attempts.popitem(last=False)
+        return count
+
+    def _extraction_cache_key(self, name: str, args: Any) -> Optional[str]:
+        """Cache key for a browser extract_content call on the current page, if cacheable"""
+        if (
+            name != "browser_use"
+            or not isinstance(args, dict)
+            or args.get("action") != "extract_content"
+            or not self.last_extraction_url
+        ):
+            return None
+        return f"{self.last_extraction_url}|{str(args.get('goal', '')).casefold()}"
+
+    def _invalidate_tool_cache(self, url: Optional[str]) -> None:
+        """Drop cached extractions for a page whose content may have changed"""
+        if not url or not self._tool_cache:
+            return
+        prefix = f"{url}|"
+        for key in [key for key in self._tool_cache if key.startswith(prefix)]:
+            del self._tool_cache[key]
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
@@ -314,6 +703,24 @@ class ToolCallAgent(ReActAgent):
         """Determine if tool execution should finish the agent"""
         return True
 
+    def _is_parallel_safe(self, name: str) -> bool:
+        """Check if a tool call may run concurrently with its neighbours"""
+        return not self._is_special_tool(name) and name in self.parallel_tool_names
+
     def _is_special_tool(self, name: str) -> bool:
         """Check if tool name is in special tools list"""
-        return name.lower() in [n.lower() for n in self.special_tool_names]
+        # Rebuild the lowercase lookup only when special_tool_names is reassigned
+        if self._special_tool_names_src is not self.special_tool_names:
+            self._special_tool_names_src = self.special_tool_names
+            self._special_tool_names_lc = frozenset(
+                n.lower() for n in self.special_tool_names
+            )
+        return name.lower() in self._special_tool_names_lc
+
+
+# browser_use action -> ToolCallAgent method updating tracking state after that action
+_BROWSER_ACTION_HANDLERS = {
+    "extract_content": ToolCallAgent._handle_extract,
+    "go_to_url": ToolCallAgent._handle_goto,
+    "web_search": ToolCallAgent._handle_search,
+}
@@ -8,6 +8,14 @@ from app.config import PROJECT_ROOT
 
 _print_level = "INFO"
 
+# Longest text (tool arguments, activity details) logged or displayed in full
+MAX_TEXT_LEN = 512
+
+
+def truncate(text: str, limit: int = MAX_TEXT_LEN) -> str:
+    """Shorten text to limit characters so large payloads don't flood logs or clients"""
+    return text if len(text) <= limit else text[:limit] + "…"
+
 
 def define_log_level(print_level="INFO", logfile_level="DEBUG", name: str = None):
     """Adjust the log level to above level"""
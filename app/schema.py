@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Awaitable, Callable, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -60,6 +60,8 @@ class Message(BaseModel):
     name: Optional[str] = Field(default=None)
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
+    # Set by agents on messages the UI surfaces; never sent to the LLM
+    kind: Optional[Literal["thought", "extraction"]] = Field(default=None)
 
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
@@ -110,14 +112,24 @@ class Message(BaseModel):
 
     @classmethod
     def assistant_message(
-        cls, content: Optional[str] = None, base64_image: Optional[str] = None
+        cls,
+        content: Optional[str] = None,
+        base64_image: Optional[str] = None,
+        kind: Optional[str] = None,
     ) -> "Message":
         """Create an assistant message"""
-        return cls(role=Role.ASSISTANT, content=content, base64_image=base64_image)
+        return cls(
+            role=Role.ASSISTANT, content=content, base64_image=base64_image, kind=kind
+        )
 
     @classmethod
     def tool_message(
-        cls, content: str, name, tool_call_id: str, base64_image: Optional[str] = None
+        cls,
+        content: str,
+        name,
+        tool_call_id: str,
+        base64_image: Optional[str] = None,
+        kind: Optional[str] = None,
     ) -> "Message":
         """Create a tool message"""
         return cls(
@@ -126,6 +138,7 @@ class Message(BaseModel):
             name=name,
             tool_call_id=tool_call_id,
             base64_image=base64_image,
+            kind=kind,
         )
 
     @classmethod
@@ -168,8 +181,12 @@ class Memory(BaseModel):
             self.messages = self.messages[-self.max_messages :]
 
     def add_messages(self, messages: List[Message]) -> None:
-        """Add multiple messages to memory"""
+        """Add multiple messages to memory, applying the message limit once"""
+        if not messages:
+            return
         self.messages.extend(messages)
+        if len(self.messages) > self.max_messages:
+            self.messages = self.messages[-self.max_messages :]
 
     def clear(self) -> None:
         """Clear all messages"""
@@ -182,3 +199,11 @@ class Memory(BaseModel):
     def to_dict_list(self) -> List[dict]:
         """Convert messages to list of dicts"""
         return [msg.to_dict() for msg in self.messages]
+
+
+class AgentEvents(BaseModel):
+    """Async callbacks an agent invokes while it works, e.g. to drive a UI"""
+
+    on_screenshot: Optional[Callable[[str], Awaitable[None]]] = None  # base64 image
+    on_action: Optional[Callable[[str, str], Awaitable[None]]] = None  # action, details
+    on_tool_result: Optional[Callable[[str, str], Awaitable[None]]] = None  # tool name, result
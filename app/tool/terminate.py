@@ -1,12 +1,14 @@
 from app.tool.base import BaseTool
 
 
+TERMINATE_NAME = "terminate"
+
 _TERMINATE_DESCRIPTION = """Terminate the interaction when the request is met OR if the assistant cannot proceed further with the task.
 When you have finished all the tasks, call this tool to end the work."""
 
 
 class Terminate(BaseTool):
-    name: str = "terminate"
+    name: str = TERMINATE_NAME
     description: str = _TERMINATE_DESCRIPTION
     parameters: dict = {
         "type": "object",
@@ -1,41 +1,149 @@
 import asyncio
 import os
-import json
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
 
+import orjson
 import uvicorn
+from tenacity import stop_after_attempt
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from app.agent.manus import Manus
+from app.agent.toolcall import EXTRACTION_MARKER
 from app.llm import LLM
-from app.logger import logger
-from app.schema import ToolCall, Message
+from app.logger import logger, truncate
+from app.schema import AgentEvents, Message, ToolCall
+
+
+# Vite dev server and the UI served by this app
+DEFAULT_ALLOWED_ORIGINS = [
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+    "http://localhost:8000",
+    "http://127.0.0.1:8000",
+]
+
+# Model and instructions used to rephrase extracted findings for the user
+FORMATTER_MODEL = "accounts/fireworks/models/llama4-maverick-instruct-basic"
+FORMATTER_SYSTEM_PROMPT = (
+    "You are an assistant that rephrases technical agent output into a natural, "
+    "conversational response based *only* on the provided findings. Be concise and "
+    "directly answer the user's question using the information."
+)
+# Messages queued for one client before it is considered too slow and dropped
+MAX_CLIENT_BACKLOG = 64
+# Seconds one frame may take to reach a client before the client is dropped
+CLIENT_SEND_TIMEOUT = 10.0
+
+# Formatter requests retried before any of the answer has been streamed to clients
+FORMATTER_MAX_ATTEMPTS = 3
+# Notice appended when the formatter fails after part of the answer was streamed
+STREAM_INTERRUPTED_NOTICE = "\n\n(The answer was cut off because the formatter stopped responding.)"
+
+# LLM.ask without its own retries: a retry after chunks have been streamed
+# would append a second copy of the answer on the client
+_ask_once = LLM.ask.retry_with(stop=stop_after_attempt(1), reraise=True)
 
 
 class UserMessage(BaseModel):
     content: str
 
 
+class ClientChannel:
+    """Outgoing messages for one WebSocket client, sent by its own task.
+
+    Queuing never waits, so a slow client can't hold up the agent or other
+    clients. A queued screenshot is replaced by a newer one; a client that
+    falls MAX_CLIENT_BACKLOG messages behind or stalls on a send is dropped
+    through on_failure.
+    """
+
+    def __init__(self, websocket: WebSocket, on_failure: Callable[[WebSocket], None]):
+        self.websocket = websocket
+        self._on_failure = on_failure
+        self._pending: Deque[Tuple[str, str]] = deque()  # (message type, encoded JSON)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._send_loop())
+
+    def put(self, message_type: str, payload: str) -> None:
+        """Queue an encoded message for this client."""
+        if message_type == "browser_state":
+            # The client only ever shows the latest screenshot
+            self._pending = deque(m for m in self._pending if m[0] != "browser_state")
+        self._pending.append((message_type, payload))
+        if len(self._pending) > MAX_CLIENT_BACKLOG:
+            logger.warning("WebSocket client is {} messages behind, dropping it", len(self._pending))
+            self._on_failure(self.websocket)
+            return
+        self._wakeup.set()
+
+    def cancel(self) -> None:
+        """Stop sending and discard anything still queued."""
+        self._pending.clear()
+        self._task.cancel()
+
+    async def _send_loop(self):
+        """Send queued messages, coalescing everything queued since the last send into one frame."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+            payloads = [payload for _, payload in self._pending]
+            self._pending.clear()
+            # Messages are already encoded, so a batch frame is just their concatenation
+            frame = (
+                payloads[0]
+                if len(payloads) == 1
+                else '{"type":"batch","events":[' + ",".join(payloads) + "]}"
+            )
+            try:
+                await asyncio.wait_for(self.websocket.send_text(frame), CLIENT_SEND_TIMEOUT)
+            except Exception as e:
+                logger.error("Error sending message to client: {}", e)
+                self._on_failure(self.websocket)
+                return
+
+
 class OpenManusUI:
     """UI server for OpenManus."""
 
-    def __init__(self, static_dir: Optional[str] = None):
-        self.app = FastAPI(title="OpenManus UI")
+    def __init__(
+        self,
+        static_dir: Optional[str] = None,
+        max_concurrent: int = 1,
+        allow_origins: Optional[List[str]] = None,
+    ):
+        self.app = FastAPI(title="OpenManus UI", default_response_class=ORJSONResponse)
         self.agent: Optional[Manus] = None
-        self.active_websockets: List[WebSocket] = []
+        self._formatter_llm: Optional[LLM] = None
+        self._last_screenshot_hash: Optional[int] = None
+        # The agent holds single-conversation state, so runs are serialized by default
+        self._process_semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: Set[asyncio.Task] = set()
+        self._agent_lock = asyncio.Lock()
+        # Connected clients, each with its own outgoing queue and sender task
+        self.active_websockets: Dict[WebSocket, ClientChannel] = {}
         self.frontend_dir = static_dir or os.path.join(os.path.dirname(__file__), "../../frontend/openmanus-ui/dist")
 
+        # Read the SPA entry point once; it only changes when the frontend is rebuilt
+        index_path = os.path.join(self.frontend_dir, "index.html")
+        self._index_bytes: Optional[bytes] = None
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                self._index_bytes = f.read()
+
         # Configure CORS
         self.app.add_middleware(
             CORSMiddleware,
-            allow_origins=["*"],
+            allow_origins=allow_origins or DEFAULT_ALLOWED_ORIGINS,
             allow_credentials=True,
-            allow_methods=["*"],
-            allow_headers=["*"],
+            allow_methods=["GET", "POST"],
+            allow_headers=["content-type"],
         )
 
         # Set up routes
@@ -48,48 +156,50 @@ class OpenManusUI:
     def setup_routes(self):
         """Set up API routes."""
 
+        @self.app.on_event("startup")
+        async def prewarm_agent():
+            """Build the agent in the background so the first message doesn't wait for it."""
+            task = asyncio.create_task(self._prewarm_agent())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
         @self.app.websocket("/ws")
         async def websocket_endpoint(websocket: WebSocket):
             await websocket.accept()
-            self.active_websockets.append(websocket)
 
             try:
                 # Don't initialize agent on connection, only when a message is received
                 # Send initial connection success
-                await websocket.send_json({"type": "connect", "status": "success"})
+                await self.send_json(websocket, {"type": "connect", "status": "success"})
+                self.active_websockets[websocket] = ClientChannel(websocket, self._drop_stalled_client)
+                # Let the next screenshot through so the new client gets one
+                self._last_screenshot_hash = None
                 logger.info("Client connected via WebSocket")
 
                 # Handle messages
                 while True:
-                    data = await websocket.receive_json()
-                    logger.info(f"Received WebSocket message: {data}")
+                    data = orjson.loads(await websocket.receive_text())
+                    logger.info("Received WebSocket message: {}", data)
 
                     if "content" in data:
                         user_message = data["content"]
-                        logger.info(f"Processing message: {user_message}")
-
-                        # Initialize agent only if not already done
-                        if self.agent is None:
-                            self.agent = Manus()
-                            self.patch_agent_methods()
+                        logger.info("Processing message: {}", user_message)
 
                         # Process the message
-                        asyncio.create_task(self.process_message(user_message))
+                        self.schedule_message(user_message)
 
             except WebSocketDisconnect:
-                if websocket in self.active_websockets:
-                    self.active_websockets.remove(websocket)
+                self._drop_client(websocket)
                 logger.info("Client disconnected from WebSocket")
 
             except Exception as e:
-                logger.error(f"WebSocket error: {str(e)}", exc_info=True)
-                if websocket in self.active_websockets:
-                    self.active_websockets.remove(websocket)
+                logger.exception("WebSocket error: {}", e)
+                self._drop_client(websocket)
 
         @self.app.get("/api/status")
         async def get_status():
             """Check if the server is running."""
-            return JSONResponse({
+            return ORJSONResponse({
                 "status": "online",
                 "agent_initialized": self.agent is not None
             })
@@ -97,15 +207,10 @@ class OpenManusUI:
         @self.app.post("/api/message")
         async def post_message(message: UserMessage):
             """Alternative API endpoint for processing messages."""
-            # Initialize agent if needed
-            if self.agent is None:
-                self.agent = Manus()
-                self.patch_agent_methods()
-
             # Process the message in background
-            asyncio.create_task(self.process_message(message.content))
+            self.schedule_message(message.content)
 
-            return JSONResponse({
+            return ORJSONResponse({
                 "status": "processing",
                 "message": message.content
             })
@@ -113,226 +218,196 @@ class OpenManusUI:
         @self.app.get("/")
         async def get_index():
             """Serve the index.html file."""
-            index_path = os.path.join(self.frontend_dir, "index.html")
-            if os.path.exists(index_path):
-                return FileResponse(index_path)
+            if self._index_bytes is not None:
+                return Response(self._index_bytes, media_type="text/html")
             return {"message": "Frontend not built yet. Please run 'npm run build' in the frontend directory."}
 
-    async def broadcast_message(self, message_type: str, data: dict):
-        """Broadcast a message to all connected WebSocket clients."""
-        message = {"type": message_type, **data}
+    @staticmethod
+    async def send_json(websocket: WebSocket, message: dict):
+        """Send a message as a JSON text frame, encoded with orjson."""
+        await websocket.send_text(orjson.dumps(message).decode())
 
+    async def broadcast_message(self, message_type: str, data: dict):
+        """Queue a message for all connected WebSocket clients."""
         # Add extra logging for browser state messages
         if message_type == "browser_state" and "base64_image" in data:
-            image_data = data["base64_image"]
-            logger.info(f"Broadcasting browser image: {len(image_data) if image_data else 0} bytes")
+            logger.debug("Broadcasting browser image: {} bytes", len(data["base64_image"] or ""))
 
-        for websocket in self.active_websockets:
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending message to client: {str(e)}")
-                # Remove broken connections
-                if websocket in self.active_websockets:
-                    self.active_websockets.remove(websocket)
-
-    def patch_agent_methods(self):
-        """Patch the agent methods to intercept and broadcast relevant information."""
-        if not self.agent:
+        try:
+            # Encode once for every client
+            payload = orjson.dumps({"type": message_type, **data}).decode()
+        except Exception as e:
+            logger.exception("Error encoding broadcast: {}", e)
             return
 
-        # Patch browser state method
-        if hasattr(self.agent, "get_browser_state"):
-            original_get_browser_state = self.agent.get_browser_state
+        for channel in list(self.active_websockets.values()):
+            channel.put(message_type, payload)
+
+    def _drop_client(self, websocket: WebSocket):
+        """Forget a client and stop its sender task."""
+        channel = self.active_websockets.pop(websocket, None)
+        if channel is not None:
+            channel.cancel()
+
+    def _drop_stalled_client(self, websocket: WebSocket):
+        """Drop a client that can't keep up and close its connection."""
+        self._drop_client(websocket)
+        task = asyncio.create_task(self._close_websocket(websocket))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
-            async def patched_get_browser_state(*args, **kwargs):
-                result = await original_get_browser_state(*args, **kwargs)
+    @staticmethod
+    async def _close_websocket(websocket: WebSocket):
+        try:
+            # 1013 "try again later": the UI shows it is disconnected instead of going stale
+            await asyncio.wait_for(websocket.close(code=1013), CLIENT_SEND_TIMEOUT)
+        except Exception as e:
+            logger.debug("Error closing stalled WebSocket: {}", e)
 
-                # If browser has a screenshot, broadcast it
-                if hasattr(self.agent, "_current_base64_image") and self.agent._current_base64_image:
-                    # Explicitly capture and send the screenshot to the UI
-                    await self.broadcast_message("browser_state", {
-                        "base64_image": self.agent._current_base64_image
-                    })
-                    logger.info("Browser screenshot captured and broadcasted")
+    def bind_agent_events(self):
+        """Route the agent's activity events to the connected UI clients."""
+        if not self.agent:
+            return
 
-                return result
+        async def on_screenshot(base64_image: str):
+            # The same page is often captured on back-to-back steps; skip repeats
+            screenshot_hash = hash(base64_image)
+            if screenshot_hash == self._last_screenshot_hash:
+                return
+            self._last_screenshot_hash = screenshot_hash
+            await self.broadcast_message("browser_state", {
+                "base64_image": base64_image
+            })
 
-            self.agent.get_browser_state = patched_get_browser_state
+        async def on_action(action: str, details: str):
+            await self.broadcast_message("agent_action", {
+                "action": action,
+                "details": truncate(details)
+            })
 
-        # Patch think method
-        if hasattr(self.agent, "think"):
-            original_think = self.agent.think
+        async def on_tool_result(tool_name: str, result: str):
+            await self.broadcast_message("agent_action", {
+                "action": f"Result: {tool_name}",
+                "details": truncate(result)
+            })
 
-            async def patched_think(*args, **kwargs):
-                # Log thinking step
-                await self.broadcast_message("agent_action", {
-                    "action": "Agent Thinking",
-                    "details": "Analyzing current state and deciding next actions..."
-                })
+        self.agent.events = AgentEvents(
+            on_screenshot=on_screenshot,
+            on_action=on_action,
+            on_tool_result=on_tool_result,
+        )
 
-                result = await original_think(*args, **kwargs)
-                return result
+    def _get_formatter_llm(self) -> LLM:
+        """Return the formatter LLM, creating it on first use."""
+        if self._formatter_llm is None:
+            self._formatter_llm = LLM(model_name=FORMATTER_MODEL)
+        return self._formatter_llm
 
-            self.agent.think = patched_think
+    async def _format_and_send(self, message: str, extracted_text: str) -> str:
+        """Rephrase extracted findings as a conversational answer, streaming it to clients."""
+        logger.info("Extracted text for prompt: {}", extracted_text)
 
-        # Patch execute_tool method
-        if hasattr(self.agent, "execute_tool"):
-            original_execute_tool = self.agent.execute_tool
+        # Prepare the prompt for the formatting model
+        format_prompt = f"""Given the user's question and the information found by an agent, provide a natural, conversational answer. Focus only on the information relevant to the question.
 
-            async def patched_execute_tool(command, *args, **kwargs):
-                tool_name = command.function.name
-                arguments = command.function.arguments
+Original User Question:
+{message}
 
-                # Log the tool execution
-                await self.broadcast_message("agent_action", {
-                    "action": f"Tool: {tool_name}",
-                    "details": f"Arguments: {arguments}"
-                })
+Information Found:
+{extracted_text}
 
-                # Special handling for browser_use tool
-                is_browser_tool = tool_name in ["browser_use", "browser"]
-
-                # Execute the tool
-                result = await original_execute_tool(command, *args, **kwargs)
-
-                # Special handling for browser screenshots
-                if is_browser_tool and result:
-                    # Try to extract the screenshot if it exists
-                    try:
-                        # Try various ways to find the screenshot
-                        if hasattr(result, "base64_image") and result.base64_image:
-                            await self.broadcast_message("browser_state", {
-                                "base64_image": result.base64_image
-                            })
-                            logger.info(f"Screenshot captured from tool result")
-                        elif hasattr(self.agent, "_current_base64_image") and self.agent._current_base64_image:
-                            await self.broadcast_message("browser_state", {
-                                "base64_image": self.agent._current_base64_image
-                            })
-                            logger.info(f"Screenshot captured from agent")
-
-                        # Inspect result object more deeply
-                        logger.info(f"Browser tool result type: {type(result)}")
-                        if hasattr(result, "__dict__"):
-                            logger.info(f"Browser tool result attributes: {result.__dict__.keys()}")
-                            # Log if there are any image-like attributes
-                            for key, value in result.__dict__.items():
-                                if isinstance(value, str) and len(value) > 1000 and 'base64' in key.lower():
-                                    logger.info(f"Found potential image in attribute: {key}")
-                                    await self.broadcast_message("browser_state", {
-                                        "base64_image": value
-                                    })
-
-                        # Check if result has a model_dump method (Pydantic)
-                        if hasattr(result, "model_dump"):
-                            result_dict = result.model_dump()
-                            for key, value in result_dict.items():
-                                if isinstance(value, str) and len(value) > 1000 and ('image' in key.lower() or 'base64' in key.lower()):
-                                    logger.info(f"Found potential image in model_dump(): {key}")
-                                    await self.broadcast_message("browser_state", {
-                                        "base64_image": value
-                                    })
-                    except Exception as e:
-                        logger.error(f"Error capturing screenshot: {e}")
-
-                # Log the result
-                await self.broadcast_message("agent_action", {
-                    "action": f"Result: {tool_name}",
-                    "details": str(result)
-                })
+Answer:"""
 
-                return result
+        logger.opt(lazy=True).info("Sending format prompt to Maverick: {}...", lambda: format_prompt[:150])
 
-            self.agent.execute_tool = patched_execute_tool
+        streamed: List[str] = []
 
-        # Also patch the browser tool's get_current_state method
-        browser_tool = None
-        if hasattr(self.agent, "available_tools") and hasattr(self.agent.available_tools, "get_tool"):
-            for tool_name in ["browser_use", "browser"]:
-                browser_tool = self.agent.available_tools.get_tool(tool_name)
-                if browser_tool:
-                    logger.info(f"Found browser tool: {tool_name}")
-                    # List all methods to help with debugging
-                    tool_methods = [method for method in dir(browser_tool) if not method.startswith('_')]
-                    logger.info(f"Available methods: {tool_methods}")
-                    break
+        async def send_chunk(chunk: str):
+            if not chunk:
+                return
+            # Open the client's message only once there is text to put in it
+            if not streamed:
+                await self.broadcast_message("agent_message_stream_start", {})
+            streamed.append(chunk)
+            await self.broadcast_message("agent_message_stream_chunk", {"content": chunk})
 
-        if browser_tool:
-            # Add a callback function that will be called when screenshots are captured
-            async def screenshot_callback(base64_image):
-                if base64_image:
-                    await self.broadcast_message("browser_state", {
-                        "base64_image": base64_image
-                    })
-                    logger.info(f"Screenshot captured and broadcasted: {len(base64_image)} bytes")
-
-            # Store the callback in the browser tool instance so it persists
-            browser_tool._ui_screenshot_callback = screenshot_callback
-
-            # Patch the agent's get_browser_state method instead
-            if hasattr(self.agent, "get_browser_state"):
-                original_agent_get_browser_state = self.agent.get_browser_state
-
-                async def patched_agent_get_browser_state(*args, **kwargs):
-                    result = await original_agent_get_browser_state(*args, **kwargs)
-
-                    # If browser has a screenshot, broadcast it
-                    if hasattr(self.agent, "_current_base64_image") and self.agent._current_base64_image:
-                        await self.broadcast_message("browser_state", {
-                            "base64_image": self.agent._current_base64_image
-                        })
-                        logger.info(f"Agent screenshot captured and broadcasted: {len(self.agent._current_base64_image)} bytes")
-
-                    return result
-
-                self.agent.get_browser_state = patched_agent_get_browser_state
-
-        # Patch the message memory to intercept image messages
-        memory = None
-        if hasattr(self.agent, "memory"):
-            memory = self.agent.memory
-            # Log memory methods for debugging
-            memory_methods = [method for method in dir(memory) if not method.startswith('_')]
-            logger.info(f"Memory methods: {memory_methods}")
-
-            # Check if memory has add_message method
-            if "add_message" in memory_methods:
+        # Stream the answer to clients as it is generated
+        try:
+            for attempt in range(1, FORMATTER_MAX_ATTEMPTS + 1):
                 try:
-                    # Try to get the original method correctly
-                    original_add_message = memory.add_message
-
-                    # Define a new method that captures images
-                    async def patched_add_message(message, *args, **kwargs):
-                        # If the message has an image, broadcast it
-                        if hasattr(message, "base64_image") and message.base64_image:
-                            await self.broadcast_message("browser_state", {
-                                "base64_image": message.base64_image
-                            })
-                            logger.info(f"Image message captured and broadcasted: {len(message.base64_image)} bytes")
-
-                        # Call the original method
-                        if asyncio.iscoroutinefunction(original_add_message):
-                            return await original_add_message(message, *args, **kwargs)
-                        else:
-                            return original_add_message(message, *args, **kwargs)
-
-                    # Replace the original method
-                    memory.add_message = patched_add_message
-                    logger.info("Successfully patched memory.add_message")
-                except AttributeError as e_attr:
-                    logger.error(f"Failed to patch memory.add_message due to AttributeError: {e_attr}. The 'Memory' object might not be what was expected at this point.")
-                except Exception as e_gen:
-                    logger.error(f"An unexpected error occurred while patching memory.add_message: {e_gen}")
-            else:
-                logger.warning("Memory has no add_message method to patch")
+                    formatted_response = await _ask_once(
+                        self._get_formatter_llm(),
+                        messages=[Message.user_message(format_prompt)],
+                        system_msgs=[Message.system_message(FORMATTER_SYSTEM_PROMPT)],
+                        stream=True,
+                        temperature=0.6, # Use the specified temperature
+                        stream_callback=send_chunk,
+                    )
+                    break
+                except Exception as e:
+                    if not streamed and attempt < FORMATTER_MAX_ATTEMPTS:
+                        logger.warning("Formatter attempt {} failed, retrying: {}", attempt, e)
+                        await asyncio.sleep(attempt)
+                        continue
+                    if not streamed:
+                        raise
+                    # The client already shows part of the answer; finish that
+                    # message instead of sending the raw output after it
+                    logger.error("Formatter failed mid-stream: {}", e)
+                    await send_chunk(STREAM_INTERRUPTED_NOTICE)
+                    formatted_response = "".join(streamed)
+                    break
+        finally:
+            if streamed:
+                await self.broadcast_message("agent_message_stream_end", {})
+
+        logger.info("✅ Formatted response using Maverick: {}", formatted_response)
+        logger.info("✅ Successfully streamed formatted response to client")
+
+        # Ensure we don't send the unformatted response later
+        self.agent._final_result = formatted_response
+        return formatted_response
+
+    async def ensure_agent(self) -> Manus:
+        """Return the agent, creating it and binding its events on first use."""
+        if self.agent is None:
+            async with self._agent_lock:
+                if self.agent is None:
+                    self.agent = Manus()
+                    self.bind_agent_events()
+        return self.agent
+
+    async def _prewarm_agent(self):
+        try:
+            await self.ensure_agent()
+            logger.info("Agent ready")
+        except Exception as e:
+            # The first message will retry construction and report the error to the client
+            logger.error("Error pre-building agent: {}", e)
+
+    def schedule_message(self, message: str):
+        """Process a user message in the background, at most max_concurrent at a time."""
+        task = asyncio.create_task(self._process_bounded(message))
+        # Keep a reference until the task finishes so it isn't garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process_bounded(self, message: str):
+        async with self._process_semaphore:
+            await self.process_message(message)
+
+    def _messages_after(self, marker: Optional[Message]) -> List[Message]:
+        """Return the agent's messages added after marker (all of them if it was trimmed away)."""
+        messages = self.agent.memory.messages
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i] is marker:
+                return messages[i + 1:]
+        return messages
 
     async def process_message(self, message: str):
         """Process a user message with the agent and broadcast results."""
         try:
-            if not self.agent:
-                self.agent = Manus()
-                self.patch_agent_methods()
+            await self.ensure_agent()
 
             # Don't immediately launch browser - wait for explicit action
             # Ensure agent knows the message
@@ -346,6 +421,10 @@ class OpenManusUI:
             max_steps = 10  # Set this to a reasonable number of steps
             max_execution_time = 60  # Maximum execution time in seconds
 
+            # Remember where this run's messages start; earlier queries share the memory
+            history = self.agent.memory.messages
+            last_before_run = history[-1] if history else None
+
             # Run the agent with the user's message and a timeout
             try:
                 # Use asyncio.wait_for to set a timeout
@@ -354,69 +433,36 @@ class OpenManusUI:
                     timeout=max_execution_time
                 )
             except asyncio.TimeoutError:
-                logger.warning(f"Agent execution timed out after {max_execution_time} seconds")
+                logger.warning("Agent execution timed out after {} seconds", max_execution_time)
                 # Even if we timeout, we can still extract thoughts/content from memory
                 response = "Agent execution timed out, but findings are still available."
 
-            logger.info(f"Raw agent response: {response[:100]}...") # Add logging to see raw response
+            logger.opt(lazy=True).info("Raw agent response: {}...", lambda: response[:100]) # Add logging to see raw response
 
             # Extract the final result intended for the user
-            final_agent_output = self.agent._final_result if hasattr(self.agent, '_final_result') and self.agent._final_result else response
+            final_agent_output = self.agent._final_result or response
 
-            logger.info(f"Final agent output: {final_agent_output[:100]}...") # Add logging to see final_agent_output
+            logger.opt(lazy=True).info("Final agent output: {}...", lambda: final_agent_output[:100]) # Add logging to see final_agent_output
 
-            # Check if agent has memory and look for extraction content in recent messages
+            # Look for the agent's latest direct answer, then its latest extraction
+            recent_msgs = self._messages_after(last_before_run)
+            agent_thoughts = next((m for m in reversed(recent_msgs) if m.kind == "thought"), None)
             extracted_content = None
-            agent_thoughts = None
-            if hasattr(self.agent, "memory") and hasattr(self.agent.memory, "messages"):
-                recent_msgs = self.agent.memory.messages[-10:] # Get 10 most recent messages
-                logger.info(f"Recent message count: {len(recent_msgs)}")
-
-                # First, look for agent's thoughts
-                for msg in reversed(recent_msgs):
-                    if hasattr(msg, "content") and msg.content and isinstance(msg.content, str):
-                        # Check if this is an agent thought message
-                        if "Manus's thoughts:" in msg.content or "thoughts:" in msg.content:
-                            logger.info(f"Found agent thoughts: {msg.content[:100]}...")
-                            agent_thoughts = msg.content
-                            # If thoughts include a recommendation or answer, use it as the final output
-                            break
-
-                # Then check for extraction results if no thoughts found
-                if not agent_thoughts:
-                    for msg in reversed(recent_msgs):
-                        if hasattr(msg, "content") and msg.content and isinstance(msg.content, str):
-                            if "Extracted from page:" in msg.content:
-                                logger.info(f"Found extraction in recent message: {msg.content[:100]}...")
-                                extracted_content = msg.content
-                                break
+            if not agent_thoughts:
+                extracted_content = next((m for m in reversed(recent_msgs) if m.kind == "extraction"), None)
 
             # If we found agent thoughts, prioritize these as they contain the agent's reasoning
             if agent_thoughts:
                 logger.info("Using agent thoughts as final output")
-                final_agent_output = agent_thoughts
-                # Extract just the response part from thoughts, removing the "Manus's thoughts:" prefix
-                if "✨ Manus's thoughts:" in agent_thoughts:
-                    cleaned_thoughts = agent_thoughts.split("✨ Manus's thoughts:", 1)[1].strip()
-                    # Use this as the direct answer
-                    await self.broadcast_message("agent_message", {
-                        "content": cleaned_thoughts
-                    })
-                    logger.info("Successfully sent agent thoughts to client")
-
-                    # Force terminate the agent to prevent further execution loops
-                    if hasattr(self.agent, "state"):
-                        try:
-                            logger.info("Setting agent state to FINISHED to stop further execution")
-                            self.agent.state = "FINISHED"
-                        except Exception as term_e:
-                            logger.error(f"Error terminating agent: {term_e}")
-
-                    return
+                await self.broadcast_message("agent_message", {
+                    "content": agent_thoughts.content
+                })
+                logger.info("Successfully sent agent thoughts to client")
+                return
             # If we found an extraction result, use it instead of raw final_agent_output
             elif extracted_content:
                 logger.info("Using extracted content instead of final agent output")
-                final_agent_output = extracted_content
+                final_agent_output = extracted_content.content
 
             # --- New Formatting Logic ---
             needs_formatting = False
@@ -424,16 +470,16 @@ class OpenManusUI:
 
             if isinstance(final_agent_output, str):
                  # Try to find and parse the JSON within "Extracted from page:"
-                 extraction_marker = "Extracted from page:"
-                 if extraction_marker in final_agent_output:
+                 marker_idx = final_agent_output.find(EXTRACTION_MARKER)
+                 if marker_idx >= 0:
                      try:
-                         # Find the start of the JSON object after the marker
-                         json_part = final_agent_output.split(extraction_marker, 1)[1].strip()
-                         logger.info(f"Attempting to parse JSON from: >>>{json_part}<<<" )
-                         data = json.loads(json_part)
-                         logger.info(f"Parsed JSON data type: {type(data)}")
+                         # Parse the JSON object after the marker without copying the prefix
+                         json_part = final_agent_output[marker_idx + len(EXTRACTION_MARKER):]
+                         logger.info("Attempting to parse JSON from: >>>{}<<<", json_part)
+                         data = orjson.loads(json_part)
+                         logger.info("Parsed JSON data type: {}", type(data))
                          if isinstance(data, dict):
-                             logger.info(f"Parsed JSON data keys: {list(data.keys())}")
+                             logger.opt(lazy=True).info("Parsed JSON data keys: {}", lambda: list(data.keys()))
 
                          if isinstance(data, dict) and 'text' in data:
                              extracted_text_for_prompt = data['text']
@@ -441,60 +487,17 @@ class OpenManusUI:
                              logger.info("Found extracted text in JSON format - IMMEDIATE FORMATTING")
                              # Immediately format and send the answer rather than continuing
                              try:
-                                 logger.info(f"Immediate formatting response using Maverick model for user query: {message}")
-                                 logger.info(f"Extracted text for prompt: {extracted_text_for_prompt}")
-
-                                 # Create a dedicated LLM instance for formatting using the Maverick model
-                                 formatter_llm = LLM(model_name="accounts/fireworks/models/llama4-maverick-instruct-basic")
-
-                                 # Prepare the prompt for the formatting model
-                                 format_prompt = f"""Given the user's question and the information found by an agent, provide a natural, conversational answer. Focus only on the information relevant to the question.
-
-Original User Question:
-{message}
-
-Information Found:
-{extracted_text_for_prompt}
-
-Answer:"""
-
-                                 logger.info(f"Sending immediate format prompt to Maverick: {format_prompt[:150]}...")
-
-                                 # Call the formatting LLM (non-streaming for a complete answer)
-                                 formatted_response = await formatter_llm.ask(
-                                     messages=[Message.user_message(format_prompt)],
-                                     system_msgs=[Message.system_message("You are an assistant that rephrases technical agent output into a natural, conversational response based *only* on the provided findings. Be concise and directly answer the user's question using the information.")],
-                                     stream=False, # Get the full response at once
-                                     temperature=0.6 # Use the specified temperature
-                                 )
-
-                                 # Log and broadcast the formatted response
-                                 logger.info(f"✅ IMMEDIATE formatted response using Maverick: {formatted_response}")
-                                 await self.broadcast_message("agent_message", {
-                                     "content": formatted_response
-                                 })
-                                 logger.info("✅ Successfully sent immediate formatted response to client")
-
-                                 # Ensure we don't send the unformatted response later
-                                 self.agent._final_result = formatted_response # Update the final result to prevent double sending
-
-                                 # Force terminate the agent to prevent further execution loops
-                                 if hasattr(self.agent, "state"):
-                                     try:
-                                         logger.info("Setting agent state to FINISHED to stop further execution")
-                                         self.agent.state = "FINISHED"
-                                     except Exception as term_e:
-                                         logger.error(f"Error terminating agent: {term_e}")
-
+                                 logger.info("Immediate formatting response using Maverick model for user query: {}", message)
+                                 await self._format_and_send(message, extracted_text_for_prompt)
                                  return # Exit after successful formatting and broadcast
 
                              except Exception as e:
-                                 logger.error(f"Error during immediate formatting with Maverick LLM: {str(e)}", exc_info=True)
+                                 logger.exception("Error during immediate formatting with Maverick LLM: {}", e)
                                  # Continue with normal flow if immediate formatting fails
                          else:
                              logger.warning("Found extraction marker but failed to get text from JSON.")
                      except Exception as json_e:
-                         logger.warning(f"Error parsing JSON after extraction marker: {json_e}")
+                         logger.warning("Error parsing JSON after extraction marker: {}", json_e)
                          # Fallback: Check if the raw output itself might need formatting based on keywords
                          if 'Searched for' in final_agent_output or 'Navigated to' in final_agent_output:
                               needs_formatting = True
@@ -502,46 +505,12 @@ Answer:"""
 
             if needs_formatting and extracted_text_for_prompt:
                 try:
-                    logger.info(f"Formatting final response using Maverick model for user query: {message}")
-                    logger.info(f"Extracted text for prompt: {extracted_text_for_prompt}")
-
-                    # Create a dedicated LLM instance for formatting using the Maverick model
-                    formatter_llm = LLM(model_name="accounts/fireworks/models/llama4-maverick-instruct-basic")
-
-                    # Prepare the prompt for the formatting model
-                    format_prompt = f"""Given the user's question and the information found by an agent, provide a natural, conversational answer. Focus only on the information relevant to the question.
-
-Original User Question:
-{message}
-
-Information Found:
-{extracted_text_for_prompt}
-
-Answer:"""
-
-                    logger.info(f"Sending format prompt to Maverick: {format_prompt[:150]}...")
-
-                    # Call the formatting LLM (non-streaming for a complete answer)
-                    formatted_response = await formatter_llm.ask(
-                        messages=[Message.user_message(format_prompt)],
-                        system_msgs=[Message.system_message("You are an assistant that rephrases technical agent output into a natural, conversational response based *only* on the provided findings. Be concise and directly answer the user's question using the information.")],
-                        stream=False, # Get the full response at once
-                        temperature=0.6 # Use the specified temperature
-                    )
-
-                    # Log and broadcast the formatted response
-                    logger.info(f"✅ Formatted response using Maverick: {formatted_response}")
-                    await self.broadcast_message("agent_message", {
-                        "content": formatted_response
-                    })
-                    logger.info("✅ Successfully sent formatted response to client")
-
-                    # Ensure we don't send the unformatted response later
-                    self.agent._final_result = formatted_response # Update the final result to prevent double sending
+                    logger.info("Formatting final response using Maverick model for user query: {}", message)
+                    await self._format_and_send(message, extracted_text_for_prompt)
                     return # Exit after successful formatting and broadcast
 
                 except Exception as e:
-                    logger.error(f"Error formatting response with Maverick LLM: {str(e)}", exc_info=True)
+                    logger.exception("Error formatting response with Maverick LLM: {}", e)
                     # Fallback: Send the potentially unformatted final_agent_output if formatting fails
                     logger.info("Falling back to unformatted output")
                     final_content = final_agent_output # Use the original agent output as fallback
@@ -560,15 +529,31 @@ Answer:"""
             })
 
         except Exception as e:
-            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            logger.exception("Error processing message: {}", e)
             await self.broadcast_message("agent_message", {
                 "content": f"Error: {str(e)}"
             })
 
     def run(self, host: str = "0.0.0.0", port: int = 8000):
         """Run the UI server."""
-        logger.info(f"Starting OpenManus UI server at http://{host}:{port}")
-        uvicorn.run(self.app, host=host, port=port)
+        logger.info("Starting OpenManus UI server at http://{}:{}", host, port)
+        # uvicorn[standard] provides uvloop, httptools and websockets. Pin the
+        # protocol implementations so a missing extra fails at startup rather than
+        # silently falling back to the pure-Python ones; "auto" already selects
+        # uvloop wherever it is installed (it has no Windows build).
+        config = uvicorn.Config(
+            self.app,
+            host=host,
+            port=port,
+            loop="auto",
+            http="httptools",
+            ws="websockets",
+            # uvicorn's default, stated explicitly: screenshots go out as base64
+            # inside JSON text frames and rely on deflate to win back the overhead
+            ws_per_message_deflate=True,
+            log_level="info",
+        )
+        uvicorn.Server(config).run()
 
 
 # Entry point to run the server directly
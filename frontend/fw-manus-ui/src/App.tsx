@@ -74,63 +74,68 @@ function App() {
     };
 
     newSocket.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      console.log('Received message:', data);
-
-      if (data.type === 'connect') {
-        console.log('Connection confirmed by server');
-      } else if (data.type === 'agent_message') {
-        setMessages(prev => [...prev, {
-          role: 'assistant',
-          content: data.content,
-          timestamp: Date.now()
-        }]);
-        setIsLoading(false);
-        // Switch to chat tab when receiving messages
-        setActiveTab(0);
-      } else if (data.type === 'agent_message_stream_start') {
-        // Initialize streaming state
-        setIsStreaming(true);
-        setStreamingMessage('');
-        // Add an empty message that will be updated
-        setMessages(prev => [...prev, {
-          role: 'assistant',
-          content: '',
-          timestamp: Date.now()
-        }]);
-        setActiveTab(0);
-      } else if (data.type === 'agent_message_stream_chunk') {
-        // Update the streaming message with new chunk
-        setStreamingMessage(prev => prev + data.content);
-        // Update the last message with current accumulated text
-        setMessages(prev => {
-          const newMessages = [...prev];
-          if (newMessages.length > 0) {
-            newMessages[newMessages.length - 1] = {
-              ...newMessages[newMessages.length - 1],
-              content: newMessages[newMessages.length - 1].content + data.content
-            };
+      const frame = JSON.parse(event.data);
+      // The server coalesces messages sent close together into one batch frame
+      const events = frame.type === 'batch' ? frame.events : [frame];
+
+      for (const data of events) {
+        console.log('Received message:', data);
+
+        if (data.type === 'connect') {
+          console.log('Connection confirmed by server');
+        } else if (data.type === 'agent_message') {
+          setMessages(prev => [...prev, {
+            role: 'assistant',
+            content: data.content,
+            timestamp: Date.now()
+          }]);
+          setIsLoading(false);
+          // Switch to chat tab when receiving messages
+          setActiveTab(0);
+        } else if (data.type === 'agent_message_stream_start') {
+          // Initialize streaming state
+          setIsStreaming(true);
+          setStreamingMessage('');
+          // Add an empty message that will be updated
+          setMessages(prev => [...prev, {
+            role: 'assistant',
+            content: '',
+            timestamp: Date.now()
+          }]);
+          setActiveTab(0);
+        } else if (data.type === 'agent_message_stream_chunk') {
+          // Update the streaming message with new chunk
+          setStreamingMessage(prev => prev + data.content);
+          // Update the last message with current accumulated text
+          setMessages(prev => {
+            const newMessages = [...prev];
+            if (newMessages.length > 0) {
+              newMessages[newMessages.length - 1] = {
+                ...newMessages[newMessages.length - 1],
+                content: newMessages[newMessages.length - 1].content + data.content
+              };
+            }
+            return newMessages;
+          });
+        } else if (data.type === 'agent_message_stream_end') {
+          // Finalize streaming
+          setIsStreaming(false);
+          setIsLoading(false);
+        } else if (data.type === 'agent_action') {
+          setAgentActions(prev => [...prev, {
+            action: data.action,
+            details: data.details,
+            timestamp: Date.now()
+          }]);
+        } else if (data.type === 'browser_state') {
+          console.log('Received browser state with image data length:',
+            data.base64_image ? data.base64_image.length : 0);
+
+          if (data.base64_image && data.base64_image.length > 0) {
+            setBrowserState(data.base64_image);
+          } else {
+            console.warn('Received empty browser screenshot');
           }
-          return newMessages;
-        });
-      } else if (data.type === 'agent_message_stream_end') {
-        // Finalize streaming
-        setIsStreaming(false);
-        setIsLoading(false);
-      } else if (data.type === 'agent_action') {
-        setAgentActions(prev => [...prev, {
-          action: data.action,
-          details: data.details,
-          timestamp: Date.now()
-        }]);
-      } else if (data.type === 'browser_state') {
-        console.log('Received browser state with image data length:',
-          data.base64_image ? data.base64_image.length : 0);
-
-        if (data.base64_image && data.base64_image.length > 0) {
-          setBrowserState(data.base64_image);
-        } else {
-          console.warn('Received empty browser screenshot');
         }
       }
     };
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import Function, Memory, ToolCall
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+class SessionTool(BaseTool):
+    """Stateful tool that fails if a second call starts before the first finishes"""
+
+    name: str = "bash"
+    description: str = "Run a command in a shared session"
+    busy: bool = False
+
+    async def execute(self, command: str) -> ToolResult:
+        if self.busy:
+            return ToolResult(error="Session is busy")
+        self.busy = True
+        try:
+            await asyncio.sleep(0.01)
+            return ToolResult(output=command)
+        finally:
+            self.busy = False
+
+
+def make_agent(*tools: BaseTool) -> ToolCallAgent:
+    # model_construct skips loading LLM settings, which these tests never use
+    return ToolCallAgent.model_construct(
+        llm=None, memory=Memory(), available_tools=ToolCollection(*tools)
+    )
+
+
+def bash_call(call_id: str, command: str) -> ToolCall:
+    return ToolCall(
+        id=call_id,
+        function=Function(name="bash", arguments=f'{{"command": "{command}"}}'),
+    )
+
+
+@pytest.mark.asyncio
+async def test_stateful_tool_calls_run_serially():
+    agent = make_agent(SessionTool())
+    agent.tool_calls = [bash_call("1", "echo one"), bash_call("2", "echo two")]
+
+    result = await agent.act()
+
+    assert result == "echo one\n\necho two"
+    assert [m.tool_call_id for m in agent.memory.messages] == ["1", "2"]
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        'Extracted from page:{"text": "Page title: Example\\nError occurred during extraction: '
+        + "x" * 200
+        + '", "metadata": {}}',
+        "Extracted from page: The requested figures are not available on this page. " + "x" * 200,
+        "Error: browser closed",
+    ],
+)
+def test_failed_extraction_needs_generic_fallback(result):
+    assert ToolCallAgent._needs_generic_extraction(result)
+
+
+def test_useful_extraction_skips_generic_fallback():
+    assert not ToolCallAgent._needs_generic_extraction("Extracted from page: " + "x" * 500)
+
+
+def test_tool_params_refresh_when_tools_are_replaced():
+    agent = make_agent()
+    assert agent._get_tool_params() == []
+
+    # MCPClients rewrites tools and tool_map in place on (re)connect
+    tool = SessionTool()
+    agent.available_tools.tools = (tool,)
+    agent.available_tools.tool_map = {tool.name: tool}
+
+    assert [p["function"]["name"] for p in agent._get_tool_params()] == ["bash"]
+
+
+class SlowLLM:
+    async def ask_tool(self, **kwargs):
+        await asyncio.sleep(0.01)
+        return kwargs["tool_choice"]
+
+
+def test_llm_semaphore_is_per_event_loop(monkeypatch):
+    monkeypatch.setattr(ToolCallAgent, "llm_concurrency", 1)
+    monkeypatch.setattr(ToolCallAgent, "_loop_state", {})
+    agent = ToolCallAgent.model_construct(llm=SlowLLM(), memory=Memory())
+
+    async def contend():
+        return await asyncio.gather(
+            agent._ask_tool_locked(tool_choice="a"),
+            agent._ask_tool_locked(tool_choice="b"),
+        )
+
+    # Each asyncio.run() has its own loop; the second must not reuse the first's semaphore
+    assert asyncio.run(contend()) == ["a", "b"]
+    assert asyncio.run(contend()) == ["a", "b"]